@@ -14,10 +14,18 @@ Sources:
 Author: Luke Steuber
 """
 
+import argparse
+import datetime
 import json
+from array import array
+from bisect import bisect_left
 from pathlib import Path
 from collections import Counter, defaultdict
-from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # optional speedup - fall back to stdlib json
+    orjson = None
 
 # Source paths
 METEORITES = Path.home() / 'datasets/witnessed-meteorite-falls/witnessed_meteorite_falls.json'
@@ -25,6 +33,57 @@ UFO_BY_YEAR = Path.home() / 'html/datavis/data_trove/data/quirky/ufo_by_year.jso
 UFO_BY_STATE = Path.home() / 'html/datavis/data_trove/data/quirky/ufo_by_state.json'
 OUTPUT_DIR = Path(__file__).parent
 
+# Study window for the temporal comparison
+FIRST_YEAR = 1900
+LAST_YEAR = 2025
+
+
+# Simplified state centroids for assignment (nearest centroid wins)
+# Only the most populous/largest states for reasonable coverage
+STATE_CENTROIDS = {
+    'CA': (36.78, -119.42), 'TX': (31.97, -99.90), 'FL': (27.66, -81.52),
+    'NY': (42.17, -74.95), 'PA': (41.20, -77.19), 'IL': (40.63, -89.40),
+    'OH': (40.42, -82.91), 'GA': (32.16, -82.90), 'NC': (35.76, -79.02),
+    'MI': (44.31, -85.60), 'NJ': (40.06, -74.41), 'VA': (37.43, -78.66),
+    'WA': (47.75, -120.74), 'AZ': (34.05, -111.09), 'MA': (42.41, -71.38),
+    'TN': (35.52, -86.58), 'IN': (40.27, -86.13), 'MO': (38.57, -92.60),
+    'MD': (39.05, -76.64), 'WI': (43.78, -88.79), 'CO': (39.55, -105.78),
+    'MN': (46.73, -94.69), 'SC': (34.00, -81.03), 'AL': (32.32, -86.90),
+    'LA': (30.98, -91.96), 'KY': (37.84, -84.27), 'OR': (43.80, -120.55),
+    'OK': (35.47, -97.52), 'CT': (41.60, -72.76), 'UT': (39.32, -111.09),
+    'IA': (41.88, -93.10), 'NV': (38.80, -116.42), 'AR': (35.20, -91.83),
+    'MS': (32.35, -89.40), 'KS': (38.53, -98.77), 'NM': (34.52, -105.87),
+    'NE': (41.49, -99.90), 'ID': (44.07, -114.74), 'WV': (38.60, -80.45),
+    'ME': (45.25, -69.45), 'MT': (46.88, -110.36), 'ND': (47.55, -101.00),
+    'SD': (43.97, -99.90), 'WY': (43.08, -107.29), 'VT': (44.56, -72.58),
+    'NH': (43.19, -71.57), 'DE': (38.91, -75.53), 'RI': (41.58, -71.48),
+}
+
+# Parallel lookup tables, built once at import
+_STATE_CODES = tuple(STATE_CENTROIDS)
+_STATE_LATS = tuple(slat for slat, _ in STATE_CENTROIDS.values())
+_STATE_LNGS = tuple(slng for _, slng in STATE_CENTROIDS.values())
+_STATE_TABLE = tuple(zip(_STATE_CODES, _STATE_LATS, _STATE_LNGS))
+
+# Fixed, pre-sorted state axis for the geographic comparison: the 50 states,
+# DC and the territories that appear in the NUFORC data
+US_STATE_CODES = tuple(sorted({
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
+    'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
+    'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
+    'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
+    'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+    'DC', 'PR', 'GU', 'VI', 'AS', 'MP', 'UM',
+}))
+_US_STATE_SET = frozenset(US_STATE_CODES)
+
+# Centroids sorted by longitude (the wider CONUS axis) so the nearest-centroid
+# search can sweep outward from the query point and stop early. `rank` keeps
+# the table order so exact distance ties resolve as a full scan would.
+_STATE_BY_LNG = tuple(sorted(
+    (slng, slat, rank, state) for rank, (state, slat, slng) in enumerate(_STATE_TABLE)))
+_SORTED_LNGS = tuple(entry[0] for entry in _STATE_BY_LNG)
+
 
 def assign_us_state(lat, lng):
     """Rough US state assignment from coordinates using bounding boxes.
@@ -34,80 +93,167 @@ def assign_us_state(lat, lng):
     if not (24.0 < lat < 50.0 and -125.0 < lng < -66.0):
         return None
 
-    # Simplified state centroids for assignment (nearest centroid wins)
-    # Only the most populous/largest states for reasonable coverage
-    state_centroids = {
-        'CA': (36.78, -119.42), 'TX': (31.97, -99.90), 'FL': (27.66, -81.52),
-        'NY': (42.17, -74.95), 'PA': (41.20, -77.19), 'IL': (40.63, -89.40),
-        'OH': (40.42, -82.91), 'GA': (32.16, -82.90), 'NC': (35.76, -79.02),
-        'MI': (44.31, -85.60), 'NJ': (40.06, -74.41), 'VA': (37.43, -78.66),
-        'WA': (47.75, -120.74), 'AZ': (34.05, -111.09), 'MA': (42.41, -71.38),
-        'TN': (35.52, -86.58), 'IN': (40.27, -86.13), 'MO': (38.57, -92.60),
-        'MD': (39.05, -76.64), 'WI': (43.78, -88.79), 'CO': (39.55, -105.78),
-        'MN': (46.73, -94.69), 'SC': (34.00, -81.03), 'AL': (32.32, -86.90),
-        'LA': (30.98, -91.96), 'KY': (37.84, -84.27), 'OR': (43.80, -120.55),
-        'OK': (35.47, -97.52), 'CT': (41.60, -72.76), 'UT': (39.32, -111.09),
-        'IA': (41.88, -93.10), 'NV': (38.80, -116.42), 'AR': (35.20, -91.83),
-        'MS': (32.35, -89.40), 'KS': (38.53, -98.77), 'NM': (34.52, -105.87),
-        'NE': (41.49, -99.90), 'ID': (44.07, -114.74), 'WV': (38.60, -80.45),
-        'ME': (45.25, -69.45), 'MT': (46.88, -110.36), 'ND': (47.55, -101.00),
-        'SD': (43.97, -99.90), 'WY': (43.08, -107.29), 'VT': (44.56, -72.58),
-        'NH': (43.19, -71.57), 'DE': (38.91, -75.53), 'RI': (41.58, -71.48),
-    }
-
+    i = bisect_left(_SORTED_LNGS, lng)
     min_dist = float('inf')
+    min_rank = len(_STATE_BY_LNG)
     closest = None
-    for state, (slat, slng) in state_centroids.items():
-        d = (lat - slat)**2 + (lng - slng)**2
-        if d < min_dist:
-            min_dist = d
-            closest = state
+    # Sweep east, then west; once the longitude gap alone exceeds the best
+    # distance so far, no centroid further out on that side can be closer
+    for side in (range(i, len(_STATE_BY_LNG)), range(i - 1, -1, -1)):
+        for j in side:
+            slng, slat, rank, state = _STATE_BY_LNG[j]
+            dlng = lng - slng
+            d = dlng * dlng
+            if d > min_dist:
+                break
+            dlat = lat - slat
+            d += dlat * dlat
+            if d < min_dist or (d == min_dist and rank < min_rank):
+                min_dist = d
+                min_rank = rank
+                closest = state
     return closest
 
 
-def build_temporal_comparison(meteorites, ufo_by_year):
-    """Build year-by-year comparison of meteorite falls vs UFO sightings."""
-    # Count meteorite falls by year
-    met_by_year = Counter()
-    for m in meteorites:
-        date = m.get('date', '')
-        if date and len(date) >= 4 and date[:4].isdigit():
-            year = int(date[:4])
-            if 1900 <= year <= 2025:
-                met_by_year[year] += 1
-
+def assign_us_states(lats, lngs):
+    """Batch assign_us_state over parallel sequences of coordinates."""
+    return [assign_us_state(lat, lng) for lat, lng in zip(lats, lngs)]
+
+
+def meteorite_states(meteorites):
+    """Assign a US state (or None) to every meteorite in one batch."""
+    return assign_us_states([m.get('latitude') for m in meteorites],
+                            [m.get('longitude') for m in meteorites])
+
+
+def load_json(path):
+    """Load a JSON file, using orjson when it is installed."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(data, path, compact=False):
+    """Write `data` as UTF-8 JSON with a trailing newline, using orjson when
+    it is installed. Indented with 2 spaces unless `compact` is set."""
+    if orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        payload = orjson.dumps(data, option=option)
+    elif compact:
+        payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n'
+    else:
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8') + b'\n'
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+
+def save_ndjson(records, path):
+    """Write `records` as newline-delimited JSON, one compact record per line."""
+    if orjson is not None:
+        lines = [orjson.dumps(r, option=orjson.OPT_APPEND_NEWLINE) for r in records]
+    else:
+        lines = [json.dumps(r, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n'
+                 for r in records]
+    with open(path, 'wb') as f:
+        f.write(b''.join(lines))
+
+
+def meteorite_year(date):
+    """Year from a meteorite date string, or None if it has no 4-digit prefix."""
+    if not date:
+        return None
+    head = date[:4]
+    if len(head) == 4 and head.isdigit():
+        return int(head)
+    return None
+
+
+# Field order of a meteorite detail record
+METEORITE_DETAIL_FIELDS = (
+    'name', 'latitude', 'longitude', 'date', 'year',
+    'mass_g', 'meteorite_class', 'fall_type', 'us_state', 'is_us',
+)
+
+
+def meteorite_record(m, date, year, state, strings):
+    """Clean meteorite record with state assignment, as a tuple in
+    METEORITE_DETAIL_FIELDS order. Repeated category values are
+    deduplicated through the shared `strings` cache."""
+    meteorite_class = m.get('meteorite_class')
+    fall_type = m.get('fall_type')
+    return (
+        m.get('name'),
+        m.get('latitude'),
+        m.get('longitude'),
+        date if date else None,
+        year,
+        m.get('mass_g'),
+        strings.setdefault(meteorite_class, meteorite_class),
+        strings.setdefault(fall_type, fall_type),
+        state,
+        state is not None,
+    )
+
+
+def detail_rows(records):
+    """Expand meteorite record tuples into a list of dicts.
+    The single dict literal gives every row the same constant key tuple and
+    key order (METEORITE_DETAIL_FIELDS), so serializers see one uniform shape."""
+    return [
+        {
+            'name': name,
+            'latitude': latitude,
+            'longitude': longitude,
+            'date': date,
+            'year': year,
+            'mass_g': mass_g,
+            'meteorite_class': meteorite_class,
+            'fall_type': fall_type,
+            'us_state': us_state,
+            'is_us': is_us,
+        }
+        for (name, latitude, longitude, date, year,
+             mass_g, meteorite_class, fall_type, us_state, is_us) in records
+    ]
+
+
+def detail_columns(records):
+    """Transpose meteorite record tuples into a dict of per-field lists."""
+    columns = zip(*records) if records else ((),) * len(METEORITE_DETAIL_FIELDS)
+    return {field: list(values) for field, values in zip(METEORITE_DETAIL_FIELDS, columns)}
+
+
+def build_temporal_comparison(met_by_year, ufo_by_year):
+    """Build year-by-year comparison of meteorite falls vs UFO sightings.
+    `met_by_year` is a histogram of fall counts indexed by year - FIRST_YEAR."""
     # UFO sightings by year
     ufo_years = {}
     for entry in ufo_by_year:
         year = entry.get('year')
         count = entry.get('count', 0)
-        if year and 1900 <= year <= 2025:
+        if year and FIRST_YEAR <= year <= LAST_YEAR:
             ufo_years[int(year)] = count
 
-    # Build combined timeline
-    all_years = sorted(set(list(met_by_year.keys()) + list(ufo_years.keys())))
+    # Build combined timeline, keeping years present in either source
     timeline = []
-    for year in all_years:
-        timeline.append({
-            'year': year,
-            'meteorite_falls': met_by_year.get(year, 0),
-            'ufo_sightings': ufo_years.get(year, 0),
-        })
+    for year, met in zip(range(FIRST_YEAR, LAST_YEAR + 1), met_by_year):
+        if met or year in ufo_years:
+            timeline.append({
+                'year': year,
+                'meteorite_falls': met,
+                'ufo_sightings': ufo_years.get(year, 0),
+            })
 
     return timeline
 
 
-def build_geographic_comparison(meteorites, ufo_by_state):
-    """Build state-level comparison of meteorite falls vs UFO sightings."""
-    # Assign US states to meteorites
-    met_by_state = Counter()
-    us_meteorites = 0
-    for m in meteorites:
-        state = assign_us_state(m.get('latitude'), m.get('longitude'))
-        if state:
-            met_by_state[state] += 1
-            us_meteorites += 1
-
+def build_geographic_comparison(met_by_state, ufo_by_state):
+    """Build state-level comparison of meteorite falls vs UFO sightings.
+    `met_by_state` maps state code -> meteorite fall count."""
     # UFO sightings by state
     ufo_states = {}
     for entry in ufo_by_state:
@@ -117,85 +263,88 @@ def build_geographic_comparison(meteorites, ufo_by_state):
             ufo_states[state] = count
 
     # Build combined state comparison
-    all_states = sorted(set(list(met_by_state.keys()) + list(ufo_states.keys())))
-    state_comparison = []
-    for state in all_states:
-        met = met_by_state.get(state, 0)
-        ufo = ufo_states.get(state, 0)
-        ratio = round(ufo / met, 1) if met > 0 else None
-        state_comparison.append({
+    # Walk the fixed state axis, falling back to a sorted merge only when a
+    # source carries codes outside it (e.g. mis-cased or Canadian entries)
+    extra = (met_by_state.keys() | ufo_states.keys()) - _US_STATE_SET
+    axis = sorted(US_STATE_CODES + tuple(extra)) if extra else US_STATE_CODES
+    all_states = [state for state in axis if state in met_by_state or state in ufo_states]
+    met_counts = [met_by_state.get(state, 0) for state in all_states]
+    ufo_counts = [ufo_states.get(state, 0) for state in all_states]
+    return [
+        {
             'state': state,
             'meteorite_falls': met,
             'ufo_sightings': ufo,
-            'ufo_per_meteorite': ratio,
-        })
-
-    return state_comparison, us_meteorites
-
-
-def build_meteorite_detail(meteorites):
-    """Clean meteorite records with state assignment."""
-    records = []
-    for m in meteorites:
+            'ufo_per_meteorite': round(ufo / met, 1) if met > 0 else None,
+        }
+        for state, met, ufo in zip(all_states, met_counts, ufo_counts)
+    ]
+
+
+def build_all(meteorites, ufo_by_year, ufo_by_state):
+    """Build every dataset section in a single pass over the meteorites.
+    Returns (timeline, state_comparison, us_meteorites, meteorite_detail),
+    with meteorite_detail as record tuples (see detail_rows/detail_columns)."""
+    states = meteorite_states(meteorites)
+    met_by_year = array('I', [0]) * (LAST_YEAR - FIRST_YEAR + 1)
+    met_by_state = Counter()
+    met_records = [None] * len(meteorites)
+    strings = {}
+    us_meteorites = 0
+    for i, (m, state) in enumerate(zip(meteorites, states)):
         date = m.get('date', '')
-        year = None
-        if date and len(date) >= 4 and date[:4].isdigit():
-            year = int(date[:4])
-
-        state = assign_us_state(m.get('latitude'), m.get('longitude'))
+        year = meteorite_year(date)
+        if year is not None and FIRST_YEAR <= year <= LAST_YEAR:
+            met_by_year[year - FIRST_YEAR] += 1
+        if state:
+            met_by_state[state] += 1
+            us_meteorites += 1
+        met_records[i] = meteorite_record(m, date, year, state, strings)
 
-        records.append({
-            'name': m.get('name'),
-            'latitude': m.get('latitude'),
-            'longitude': m.get('longitude'),
-            'date': date if date else None,
-            'year': year,
-            'mass_g': m.get('mass_g'),
-            'meteorite_class': m.get('meteorite_class'),
-            'fall_type': m.get('fall_type'),
-            'us_state': state,
-            'is_us': state is not None,
-        })
-    return records
+    timeline = build_temporal_comparison(met_by_year, ufo_by_year)
+    state_comparison = build_geographic_comparison(met_by_state, ufo_by_state)
+    return timeline, state_comparison, us_meteorites, met_records
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Build the meteorites & UFOs detection bias dataset.')
+    parser.add_argument('--compact', action='store_true',
+                        help='write the JSON output without indentation')
+    parser.add_argument('--columnar', action='store_true',
+                        help='write meteorite_detail as per-field lists instead of records')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='also write meteorite_detail as newline-delimited JSON')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("METEORITES & UFOs: DETECTION BIAS STUDY")
     print("=" * 60)
 
     # Load sources
-    with open(METEORITES) as f:
-        meteorites = json.load(f)
-    with open(UFO_BY_YEAR) as f:
-        ufo_by_year = json.load(f)
-    with open(UFO_BY_STATE) as f:
-        ufo_by_state = json.load(f)
+    meteorites = load_json(METEORITES)
+    ufo_by_year = load_json(UFO_BY_YEAR)
+    ufo_by_state = load_json(UFO_BY_STATE)
 
     print(f"Meteorite falls: {len(meteorites):,}")
     print(f"UFO year entries: {len(ufo_by_year)}")
     print(f"UFO state entries: {len(ufo_by_state)}")
 
-    # Build temporal comparison
-    timeline = build_temporal_comparison(meteorites, ufo_by_year)
+    timeline, state_data, us_meteorites, met_records = build_all(
+        meteorites, ufo_by_year, ufo_by_state)
     print(f"\nTemporal records (1900-2025): {len(timeline)}")
-
-    # Build geographic comparison
-    state_data, us_meteorites = build_geographic_comparison(meteorites, ufo_by_state)
     print(f"State records: {len(state_data)}")
     print(f"US meteorite falls: {us_meteorites}")
 
-    # Build detailed meteorite records
-    met_detail = build_meteorite_detail(meteorites)
-    us_count = sum(1 for m in met_detail if m['is_us'])
-    print(f"Meteorite detail records: {len(met_detail)} ({us_count} US)")
+    print(f"Meteorite detail records: {len(met_records)} ({us_meteorites} US)")
+
+    met_detail = detail_columns(met_records) if args.columnar else detail_rows(met_records)
 
     # Combined output
     dataset = {
         'metadata': {
             'title': 'Meteorites & UFOs: Detection Bias Study',
             'description': 'Comparing witnessed meteorite falls with UFO sighting reports to explore detection bias patterns. Both phenomena involve sky-watching, revealing how location, population density, and cultural factors affect what gets reported.',
-            'created': datetime.now().strftime('%Y-%m-%d'),
+            'created': datetime.date.today().isoformat(),
             'sources': {
                 'meteorite_falls': {
                     'source': 'Meteoritical Bulletin (via NASA)',
@@ -213,7 +362,7 @@ def main():
             'record_counts': {
                 'temporal_comparison': len(timeline),
                 'state_comparison': len(state_data),
-                'meteorite_detail': len(met_detail),
+                'meteorite_detail': len(met_records),
             }
         },
         'temporal_comparison': timeline,
@@ -225,13 +374,17 @@ def main():
     OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
 
     output_path = OUTPUT_DIR / 'meteorites_ufos_detection_bias.json'
-    with open(output_path, 'w') as f:
-        json.dump(dataset, f, indent=2, ensure_ascii=False)
+    save_json(dataset, output_path, compact=args.compact)
 
     size_mb = output_path.stat().st_size / 1024 / 1024
     print(f"\nSaved to: {output_path}")
     print(f"File size: {size_mb:.2f} MB")
 
+    if args.ndjson:
+        ndjson_path = OUTPUT_DIR / 'meteorites_ufos_detection_bias.ndjson'
+        save_ndjson(detail_rows(met_records) if args.columnar else met_detail, ndjson_path)
+        print(f"Saved meteorite detail to: {ndjson_path}")
+
     # Print some interesting findings
     print(f"\n{'='*60}")
     print("INTERESTING FINDINGS:")